@@ -14,17 +14,175 @@ import os
 import sys
 import json
 import argparse
+import queue
+import threading
 import time
 from datetime import datetime, timedelta
+from operator import attrgetter
 import pandas as pd
 
-def download_live_chat_replay(video_id, output_dir="."):
-    """Download live chat replay using pytchat."""
+from chat_utils import count_activity, parse_time_offsets, read_chat_columns, write_csv
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pa_parquet
+except ImportError:
+    pa = None
+
+def _dump_json(data, path, pretty=False):
+    """Write data to a JSON file, using orjson when it is installed.
+    
+    The output is compact unless pretty is set, which indents it by two spaces.
+    """
+    if orjson is not None:
+        with open(path, "wb") as f:
+            f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2 if pretty else None))
+    else:
+        with open(path, "w", encoding="utf-8") as f:
+            if pretty:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            else:
+                json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+
+def _load_json(path):
+    """Read a JSON file, using orjson when it is installed."""
+    if orjson is not None:
+        with open(path, "rb") as f:
+            return orjson.loads(f.read())
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def _write_activity(df, path):
+    """Write a DataFrame to Parquet when pyarrow is installed, otherwise to CSV.
+    
+    The extension of path is replaced to match the format written, and the
+    path of the file actually written is returned.
+    """
+    root = os.path.splitext(path)[0]
+    if pa is not None:
+        path = root + ".parquet"
+        pa_parquet.write_table(pa.Table.from_pandas(df, preserve_index=False), path)
+    else:
+        path = root + ".csv"
+        df.to_csv(path, index=False)
+    return path
+
+def _jsonl_line(data):
+    """Serialize a record as a single JSON-Lines entry."""
+    if orjson is not None:
+        return orjson.dumps(data) + b"\n"
+    return json.dumps(data, ensure_ascii=False).encode("utf-8") + b"\n"
+
+# Chat item attributes copied into each message. Each group is fetched with a
+# single attrgetter call; the defaults cover items that lack an attribute.
+_AUTHOR_FIELDS = ("name", "channelId", "isChatSponsor", "isChatModerator", "isChatOwner")
+_AUTHOR_DEFAULTS = ("", "", False, False, False)
+_ITEM_FIELDS = ("message", "timestamp", "datetime", "elapsedTime", "amountValue", "amountString", "currency")
+_ITEM_DEFAULTS = ("", 0, "", 0, None, "", "")
+_AUTHOR_GET = attrgetter(*_AUTHOR_FIELDS)
+_ITEM_GET = attrgetter(*_ITEM_FIELDS)
+
+# Delay between chat fetches: short while messages keep arriving, doubling up
+# to the maximum while the chat is quiet
+_MIN_POLL_DELAY = 0.01
+_MAX_POLL_DELAY = 1.0
+
+# Minimum seconds between progress line updates
+_PROGRESS_INTERVAL = 0.1
+
+# Serialized batches that may wait for the checkpoint writer before the
+# download loop blocks
+_CHECKPOINT_QUEUE_SIZE = 64
+
+def _write_checkpoint(path, batches):
+    """Append serialized batches from the queue to the checkpoint until None arrives.
+    
+    The file is opened for appending, so what an earlier interrupted run wrote
+    is kept ahead of this run's messages rather than truncated.
+    """
+    try:
+        with open(path, "ab") as f:
+            while True:
+                batch = batches.get()
+                if batch is None:
+                    return
+                f.write(batch)
+    except OSError as e:
+        print(f"\nError writing checkpoint file: {e}")
+        
+        # Keep draining so the download loop never blocks on a full queue
+        while batches.get() is not None:
+            pass
+
+def _get_fields(getter, obj, fields, defaults):
+    """Fetch a group of attributes at once, using defaults for missing ones."""
+    try:
+        return getter(obj)
+    except AttributeError:
+        return tuple(getattr(obj, name, default) for name, default in zip(fields, defaults))
+
+# Order of the fields in an extracted row. The collected messages are stored
+# as one list per field in this order, plus an "is_superchat" column.
+_ROW_COLUMNS = ("author_name", "author_id", "is_member", "is_moderator", "is_owner",
+                "message", "timestamp", "datetime", "time_in_seconds",
+                "amount", "amount_string", "currency", "message_length")
+_MESSAGE_INDEX = _ROW_COLUMNS.index("message")
+_AMOUNT_INDEX = _ROW_COLUMNS.index("amount")
+
+def _message_from_row(row):
+    """Build the saved message dictionary from an extracted chat item row."""
+    (author_name, author_id, is_member, is_moderator, is_owner,
+     message, timestamp, dt, elapsed, amount, amount_string, currency, message_length) = row
+    message_data = {
+        "author_name": author_name,
+        "author_id": author_id,
+        "message": message,
+        "message_length": message_length,
+        "timestamp": timestamp,
+        "datetime": str(dt),
+        "time_in_seconds": elapsed,
+        "is_member": is_member,
+        "is_moderator": is_moderator,
+        "is_owner": is_owner
+    }
+    
+    # Add superchat information if available
+    if amount:
+        message_data["is_superchat"] = True
+        message_data["amount"] = amount
+        message_data["amount_string"] = amount_string
+        message_data["currency"] = currency
+    else:
+        message_data["is_superchat"] = False
+    
+    return message_data
+
+def _iter_rows(columns):
+    """Iterate over the collected message columns row by row."""
+    return zip(*(columns[name] for name in _ROW_COLUMNS))
+
+def download_live_chat_replay(video_id, output_dir=".", pretty=False):
+    """Download live chat replay using pytchat.
+    
+    The chat is saved as compact JSON, or indented JSON if pretty is set.
+    
+    Returns the path of the saved JSON file and the messages as a dictionary of
+    column lists, or (None, None) if no chat could be downloaded.
+    """
     print(f"Downloading live chat replay for video ID: {video_id}")
     
     # Create output directory if it doesn't exist
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
+    os.makedirs(output_dir, exist_ok=True)
     
     try:
         # Import pytchat here to handle import errors better
@@ -35,119 +193,151 @@ def download_live_chat_replay(video_id, output_dir="."):
         
         if not chat:
             print(f"Failed to initialize chat for video {video_id}")
-            return None
+            return None, None
         
         # Check if chat is available
         if not chat.is_alive():
             print(f"No live chat replay available for video {video_id}")
-            return None
+            return None, None
         
-        # Prepare to collect messages
-        all_messages = []
+        # Prepare to collect messages. They are stored column-wise, one list per
+        # field, and only turned into dictionaries when they are written out.
+        columns = {name: [] for name in _ROW_COLUMNS + ("is_superchat",)}
+        row_columns = [columns[name] for name in _ROW_COLUMNS]
         message_count = 0
+        poll_delay = _MIN_POLL_DELAY
         start_time = time.time()
+        last_progress = 0.0
+        
+        # Each batch is appended to a JSON-Lines checkpoint so progress survives
+        # an interrupted download without rewriting everything collected so far.
+        # The writes happen on a separate thread so disk I/O never stalls fetching.
+        checkpoint_file = os.path.join(output_dir, f"{video_id}_chat.jsonl")
+        checkpoint_batches = queue.Queue(maxsize=_CHECKPOINT_QUEUE_SIZE)
+        checkpoint_writer = threading.Thread(
+            target=_write_checkpoint, args=(checkpoint_file, checkpoint_batches), daemon=True
+        )
+        checkpoint_writer.start()
+        
+        # Bind the per-item helpers to locals so the hot loop avoids global lookups
+        get_author = _AUTHOR_GET
+        get_item = _ITEM_GET
+        message_index = _MESSAGE_INDEX
         
         print("Starting chat replay download...")
         
-        # Get all chat messages
-        while chat.is_alive():
-            # Get new data
-            data = chat.get()
-            items = data.items
-            
-            if items:
-                # Process each chat item
-                for item in items:
-                    try:
-                        # Create a simpler, safer dictionary with error handling
-                        message_data = {
-                            "author_name": getattr(item.author, 'name', ''),
-                            "author_id": getattr(item.author, 'channelId', ''),
-                            "message": getattr(item, 'message', ''),
-                            "timestamp": getattr(item, 'timestamp', 0),
-                            "datetime": str(getattr(item, 'datetime', '')),
-                            "time_in_seconds": getattr(item, 'elapsedTime', 0),
-                            "is_member": getattr(item.author, 'isChatSponsor', False),
-                            "is_moderator": getattr(item.author, 'isChatModerator', False),
-                            "is_owner": getattr(item.author, 'isChatOwner', False)
-                        }
-                        
-                        # Add superchat information if available
-                        if hasattr(item, 'amountValue') and item.amountValue:
-                            message_data["is_superchat"] = True
-                            message_data["amount"] = item.amountValue
-                            message_data["amount_string"] = getattr(item, 'amountString', '')
-                            message_data["currency"] = getattr(item, 'currency', '')
-                        else:
-                            message_data["is_superchat"] = False
-                        
-                        all_messages.append(message_data)
-                    except Exception as e:
-                        print(f"Error processing chat item: {e}")
-                        continue
-                
-                # Update count
-                message_count = len(all_messages)
+        try:
+            # Get all chat messages
+            while chat.is_alive():
+                # Get new data
+                data = chat.get()
+                items = data.items
                 
-                # Print progress
-                elapsed = time.time() - start_time
-                print(f"\rDownloaded {message_count} messages... ({elapsed:.1f} seconds)", end="")
+                if items:
+                    batch = []
+                    append = batch.append
+                    
+                    # Process each chat item
+                    for item in items:
+                        try:
+                            author = item.author
+                            try:
+                                row = get_author(author) + get_item(item)
+                            except AttributeError:
+                                row = (_get_fields(get_author, author, _AUTHOR_FIELDS, _AUTHOR_DEFAULTS)
+                                       + _get_fields(get_item, item, _ITEM_FIELDS, _ITEM_DEFAULTS))
+                            
+                            # Store the message length now so analysis doesn't have to recompute it
+                            append(row + (len(row[message_index]),))
+                        except Exception as e:
+                            print(f"Error processing chat item: {e}")
+                            continue
+                    
+                    # Transpose the batch into the columns
+                    for column, values in zip(row_columns, zip(*batch)):
+                        column.extend(values)
+                    columns["is_superchat"].extend(bool(row[_AMOUNT_INDEX]) for row in batch)
+                    
+                    # Queue only the new messages for the checkpoint, as one write
+                    checkpoint_batches.put(b"".join(_jsonl_line(_message_from_row(row)) for row in batch))
+                    
+                    # Update count
+                    message_count = len(columns["message"])
+                    
+                    # Print progress, at most every _PROGRESS_INTERVAL seconds
+                    now = time.time()
+                    if now - last_progress >= _PROGRESS_INTERVAL:
+                        last_progress = now
+                        sys.stdout.write(f"\rDownloaded {message_count} messages... ({now - start_time:.1f} seconds)")
                 
-                # Save intermediate results every 1000 messages
-                if message_count % 1000 == 0:
-                    intermediate_file = os.path.join(output_dir, f"{video_id}_chat_temp.json")
-                    with open(intermediate_file, "w", encoding="utf-8") as f:
-                        json.dump(all_messages, f, ensure_ascii=False, indent=2)
-            
-            # Pause briefly to avoid high CPU usage
-            time.sleep(0.1)
+                # Pause briefly to avoid high CPU usage, backing off while idle
+                poll_delay = _MIN_POLL_DELAY if items else min(poll_delay * 2, _MAX_POLL_DELAY)
+                time.sleep(poll_delay)
+        finally:
+            # Let the writer flush what is queued and close the checkpoint
+            checkpoint_batches.put(None)
+            checkpoint_writer.join()
         
+        # Final progress line with the complete count
+        sys.stdout.write(f"\rDownloaded {message_count} messages... ({time.time() - start_time:.1f} seconds)")
         print("\nChat replay download complete.")
     
     except ImportError:
         print("\nError: The pytchat library is not installed.")
         print("Please install it with: pip install pytchat")
-        return None
+        return None, None
     except Exception as e:
         print(f"\nError during download: {e}")
-        if all_messages:
-            print(f"Saving {len(all_messages)} messages collected before the error...")
+        if columns["message"]:
+            print(f"Saving {len(columns['message'])} messages collected before the error...")
         else:
-            return None
+            return None, None
     
     # Save all messages
-    if all_messages:
+    if columns["message"]:
         output_file = os.path.join(output_dir, f"{video_id}_live_chat.json")
-        with open(output_file, "w", encoding="utf-8") as f:
-            json.dump(all_messages, f, ensure_ascii=False, indent=2)
-        print(f"Successfully saved {len(all_messages)} chat messages to: {output_file}")
-        return output_file
+        _dump_json([_message_from_row(row) for row in _iter_rows(columns)], output_file, pretty)
+        print(f"Successfully saved {len(columns['message'])} chat messages to: {output_file}")
+        
+        # The full file supersedes the checkpoint
+        if os.path.exists(checkpoint_file):
+            os.remove(checkpoint_file)
+        return output_file, columns
     else:
         print("No chat messages were found for this video.")
-        return None
+        return None, None
 
 def format_time_from_seconds(seconds):
     """Convert seconds to HH:MM:SS format."""
     return str(timedelta(seconds=seconds))
 
-def analyze_chat_data(file_path):
-    """Analyze the downloaded chat data and provide insights."""
+def analyze_chat_data(file_path, columns=None):
+    """Analyze the downloaded chat data and provide insights.
+    
+    If the message columns from the download are passed in, they are used
+    directly instead of reloading the saved file.
+    """
     print("\nAnalyzing chat data...")
     
     try:
-        # Load the data
-        with open(file_path, "r", encoding="utf-8") as f:
-            chat_data = json.load(f)
+        # Convert to DataFrame, streaming the saved file into columns if needed
+        if columns is None and ijson is not None:
+            columns = read_chat_columns(file_path)
+        if columns is not None:
+            df = pd.DataFrame(columns, copy=False)
+        else:
+            df = pd.DataFrame(_load_json(file_path))
         
-        # Convert to DataFrame
-        df = pd.DataFrame(chat_data)
+        # Author names repeat heavily; as a categorical, counting them works on
+        # integer codes instead of hashing every string
+        df["author_name"] = df["author_name"].astype("category")
         
         # Basic statistics
         total_messages = len(df)
         unique_authors = df["author_name"].nunique()
         
         # Author statistics
-        top_authors = df["author_name"].value_counts().head(10)
+        top_authors = list(df["author_name"].value_counts().head(10).items())
         
         # Super chat statistics
         if "is_superchat" in df.columns:
@@ -158,19 +348,13 @@ def analyze_chat_data(file_path):
         
         # Time statistics
         if "time_in_seconds" in df.columns:
-            df["minute_mark"] = (df["time_in_seconds"] // 60).astype(int)
-            messages_per_minute = df.groupby("minute_mark").size()
-            peak_minute = messages_per_minute.idxmax()
+            minute_marks = parse_time_offsets(df["time_in_seconds"]).to_numpy() // 60
+            messages_per_minute, messages_per_5min, messages_per_10min = count_activity(minute_marks)
+            peak_minute = int(messages_per_minute.idxmax())
             peak_count = messages_per_minute.max()
             
-            # Get 5-minute intervals
-            df["five_min_interval"] = (df["time_in_seconds"] // 300).astype(int) * 5
-            messages_per_5min = df.groupby("five_min_interval").size()
+            # Get 5 and 10-minute intervals
             top_5min_intervals = messages_per_5min.nlargest(5)
-            
-            # Get 10-minute intervals
-            df["ten_min_interval"] = (df["time_in_seconds"] // 600).astype(int) * 10
-            messages_per_10min = df.groupby("ten_min_interval").size()
             top_10min_intervals = messages_per_10min.nlargest(5)
         
         # Print summary
@@ -187,7 +371,7 @@ def analyze_chat_data(file_path):
                 print(f"Super Chat Total: {superchat_amount:.2f}")
         
         print("\nTop 10 Commenters:")
-        for author, count in top_authors.items():
+        for author, count in top_authors:
             print(f"  - {author}: {count} messages")
         
         if "time_in_seconds" in df.columns:
@@ -196,43 +380,32 @@ def analyze_chat_data(file_path):
             
             print("\n5-Minute Intervals with Most Activity:")
             for interval, count in top_5min_intervals.items():
-                start_time = format_time_from_seconds(interval * 60)
-                end_time = format_time_from_seconds((interval + 5) * 60)
+                start_time = format_time_from_seconds(int(interval) * 60)
+                end_time = format_time_from_seconds((int(interval) + 5) * 60)
                 print(f"  - {start_time} to {end_time}: {count} messages")
             
             print("\n10-Minute Intervals with Most Activity:")
             for interval, count in top_10min_intervals.items():
-                start_time = format_time_from_seconds(interval * 60)
-                end_time = format_time_from_seconds((interval + 10) * 60)
+                start_time = format_time_from_seconds(int(interval) * 60)
+                end_time = format_time_from_seconds((int(interval) + 10) * 60)
                 print(f"  - {start_time} to {end_time}: {count} messages")
         
         print("\n" + "="*50)
         
         # Save analysis as CSV files
         analysis_dir = os.path.join(os.path.dirname(file_path), "analysis")
-        if not os.path.exists(analysis_dir):
-            os.makedirs(analysis_dir)
+        os.makedirs(analysis_dir, exist_ok=True)
         
         # Save top authors
-        top_authors_df = top_authors.reset_index()
-        top_authors_df.columns = ["author", "message_count"]
-        top_authors_df.to_csv(os.path.join(analysis_dir, "top_authors.csv"), index=False)
+        top_authors_df = pd.DataFrame(top_authors, columns=["author", "message_count"])
+        write_csv(top_authors_df, os.path.join(analysis_dir, "top_authors.csv"))
         
         if "time_in_seconds" in df.columns:
-            # Save minute activity
+            # Save minute activity. Coarser intervals are derived from it when
+            # read, e.g. df.groupby(df["minute"] // 5)["message_count"].sum()
             minute_activity = messages_per_minute.reset_index()
             minute_activity.columns = ["minute", "message_count"]
-            minute_activity.to_csv(os.path.join(analysis_dir, "minute_activity.csv"), index=False)
-            
-            # Save 5-minute intervals
-            five_min_activity = messages_per_5min.reset_index()
-            five_min_activity.columns = ["five_min_interval", "message_count"]
-            five_min_activity.to_csv(os.path.join(analysis_dir, "five_min_activity.csv"), index=False)
-            
-            # Save 10-minute intervals
-            ten_min_activity = messages_per_10min.reset_index()
-            ten_min_activity.columns = ["ten_min_interval", "message_count"]
-            ten_min_activity.to_csv(os.path.join(analysis_dir, "ten_min_activity.csv"), index=False)
+            _write_activity(minute_activity, os.path.join(analysis_dir, "minute_activity"))
         
         print(f"Analysis files saved to {analysis_dir}")
         
@@ -249,6 +422,8 @@ def parse_args():
                         help="Output directory for the chat replay file (default: current directory)")
     parser.add_argument("--no-analysis", action="store_true",
                         help="Skip chat data analysis")
+    parser.add_argument("--pretty", action="store_true",
+                        help="Save the chat JSON indented for readability (default: compact)")
     
     args = parser.parse_args()
     
@@ -275,12 +450,12 @@ def main():
     args = parse_args()
     
     # Download live chat replay
-    output_file = download_live_chat_replay(args.video_id, args.output_dir)
+    output_file, columns = download_live_chat_replay(args.video_id, args.output_dir, args.pretty)
     
     # Analyze chat data if available
     if output_file and not args.no_analysis:
         try:
-            analyze_chat_data(output_file)
+            analyze_chat_data(output_file, columns)
         except Exception as e:
             print(f"Error during analysis: {e}")
     
@@ -11,21 +11,48 @@ import argparse
 import json
 import os
 import sys
+import numpy as np
 import pandas as pd
+import matplotlib
+matplotlib.use('Agg')  # Charts are only saved to files, never shown
 import matplotlib.pyplot as plt
 from datetime import datetime
-from collections import Counter
+
+from chat_utils import count_activity, parse_time_offsets, read_chat_columns, write_csv
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
 
 def load_chat_data(file_path):
     """Load chat data from a JSON file and return as a pandas DataFrame."""
     print(f"Loading chat data from: {file_path}")
     
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            chat_data = json.load(f)
+        # Create DataFrame from the JSON data, streaming it into columns when
+        # ijson is available
+        if ijson is not None:
+            df = pd.DataFrame(read_chat_columns(file_path), copy=False)
+        else:
+            if orjson is not None:
+                with open(file_path, 'rb') as f:
+                    chat_data = orjson.loads(f.read())
+            else:
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    chat_data = json.load(f)
+            df = pd.DataFrame(chat_data)
         
-        # Create DataFrame from the JSON data
-        df = pd.DataFrame(chat_data)
+        # Author names repeat heavily; as a categorical, counting and grouping
+        # them works on integer codes instead of hashing every string
+        for author_column in ('author_name', 'author'):
+            if author_column in df.columns:
+                df[author_column] = df[author_column].astype('category')
         
         # Convert timestamp to datetime if it exists
         if 'timestamp' in df.columns:
@@ -35,31 +62,10 @@ def load_chat_data(file_path):
         
         # Extract video_offset_seconds from time_in_seconds
         if 'time_in_seconds' in df.columns:
-            # Parse time format like "2:30" or "-1:00" to seconds
-            def parse_time(time_str):
-                try:
-                    if time_str.startswith('-'):
-                        # Negative time (before stream starts)
-                        time_str = time_str[1:]
-                        sign = -1
-                    else:
-                        sign = 1
-                        
-                    parts = time_str.split(':')
-                    if len(parts) == 2:  # MM:SS
-                        return sign * (int(parts[0]) * 60 + int(parts[1]))
-                    elif len(parts) == 3:  # HH:MM:SS
-                        return sign * (int(parts[0]) * 3600 + int(parts[1]) * 60 + int(parts[2]))
-                    return 0
-                except:
-                    return 0
-                    
-            df['video_offset_seconds'] = df['time_in_seconds'].apply(parse_time)
+            df['video_offset_seconds'] = parse_time_offsets(df['time_in_seconds'])
             
-            # Add time markers for interval analysis
-            df['minute_mark'] = (df['video_offset_seconds'] // 60).astype(int)
-            df['five_minute_interval'] = (df['video_offset_seconds'] // 300).astype(int) * 5
-            df['ten_minute_interval'] = (df['video_offset_seconds'] // 600).astype(int) * 10
+            # Add minute markers for interval analysis
+            df['minute_mark'] = df['video_offset_seconds'] // 60
         
         print(f"Successfully loaded {len(df)} chat messages")
         return df
@@ -90,20 +96,38 @@ def analyze_chat_data(df):
     top_commenters.columns = ['author', 'comment_count']
     
     # Top comments (by length, as a simple proxy for engagement)
-    df['message_length'] = df['message'].str.len()
-    top_comments = df.sort_values('message_length', ascending=False).head(10)
+    # Files saved by chat.py already include message_length. Rows from older
+    # files mixed in lack it, so theirs is computed from the message; -1 is left
+    # only where the message is missing too. np.argpartition finds the 10
+    # longest in linear time; only those get sorted.
+    if 'message_length' in df.columns:
+        lengths = df['message_length']
+        missing = lengths.isna()
+        if missing.any():
+            lengths = lengths.where(~missing, df['message'][missing].str.len())
+    else:
+        lengths = df['message'].str.len()
+    lengths = lengths.fillna(-1).to_numpy(dtype=np.int64)
+    top_count = min(10, len(lengths))
+    top_positions = np.argpartition(-lengths, top_count - 1)[:top_count]
+    top_positions = top_positions[np.argsort(-lengths[top_positions], kind='stable')]
+    top_comments = df.iloc[top_positions]
     top_comments = top_comments[[author_column, 'message', 'time_in_seconds' if 'time_in_seconds' in df.columns else 'datetime']]
     top_comments.columns = ['author', 'message', 'timestamp_text']
     
     # Analysis by time intervals
-    if 'five_minute_interval' in df.columns:
+    activity_counts = None
+    if 'minute_mark' in df.columns:
+        activity_counts = count_activity(df['minute_mark'])
+        _, five_min_counts, ten_min_counts = activity_counts
+        
         # Five minute intervals with most comments
-        five_min_intervals = df.groupby('five_minute_interval').size().reset_index()
+        five_min_intervals = five_min_counts.reset_index()
         five_min_intervals.columns = ['five_minute_interval', 'comment_count']
         five_min_intervals = five_min_intervals.sort_values('comment_count', ascending=False).head(10)
         
         # Ten minute intervals with most comments
-        ten_min_intervals = df.groupby('ten_minute_interval').size().reset_index()
+        ten_min_intervals = ten_min_counts.reset_index()
         ten_min_intervals.columns = ['ten_minute_interval', 'comment_count']
         ten_min_intervals = ten_min_intervals.sort_values('comment_count', ascending=False).head(10)
         
@@ -142,11 +166,16 @@ def analyze_chat_data(df):
         "five_minute_intervals": five_min_intervals,
         "ten_minute_intervals": ten_min_intervals,
         "member_percentage": member_percentage,
-        "superchat_percentage": superchat_percentage
+        "superchat_percentage": superchat_percentage,
+        "activity_counts": activity_counts
     }
 
-def generate_visualizations(df, file_name, output_dir):
-    """Generate visualizations of the chat data."""
+def generate_visualizations(df, file_name, output_dir, activity_counts=None):
+    """Generate visualizations of the chat data.
+    
+    activity_counts can be the per-minute, 5-minute and 10-minute counts from
+    analyze_chat_data, so they are not counted a second time.
+    """
     if df.empty:
         print("No data available for visualization.")
         return
@@ -155,70 +184,65 @@ def generate_visualizations(df, file_name, output_dir):
     video_id = os.path.basename(file_name).split('_')[0]
     
     # Create the output directory if it doesn't exist
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+    
+    # Count comments per minute and per 5-minute interval - NOT accumulating.
+    # The counts are already in chronological order.
+    if 'minute_mark' in df.columns:
+        if activity_counts is None:
+            activity_counts = count_activity(df['minute_mark'])
+        minute_counts, five_min_intervals, _ = activity_counts
+    
+    # Both charts are drawn on one figure that is cleared between them
+    fig, ax = plt.subplots(figsize=(12, 6))
     
     # 1. Comments over time (by minute)
     if 'minute_mark' in df.columns:
-        plt.figure(figsize=(12, 6))
-        
-        # Group by minute and count comments - NOT accumulating
-        minute_counts = df.groupby('minute_mark').size()
-        
-        # Sort by minute mark for chronological order
-        minute_counts = minute_counts.sort_index()
-        
         # Convert minute marks to readable time format for x-axis
         minute_labels = [f"{m//60:02d}:{m%60:02d}" for m in minute_counts.index]
         
-        # Plot the data
-        plt.bar(range(len(minute_counts)), minute_counts.values, color='skyblue')
+        # Plot the data, rasterizing the bars so long streams don't produce
+        # thousands of separate vector shapes
+        ax.bar(range(len(minute_counts)), minute_counts.values, color='skyblue', rasterized=True)
         
         # Set x-axis ticks and labels (showing fewer labels to avoid crowding)
         tick_spacing = max(1, len(minute_counts) // 20)  # Show ~20 labels at most
-        plt.xticks(
-            range(0, len(minute_counts), tick_spacing),
+        ax.set_xticks(range(0, len(minute_counts), tick_spacing))
+        ax.set_xticklabels(
             [minute_labels[i] for i in range(0, len(minute_counts), tick_spacing)],
             rotation=45
         )
         
-        plt.title('Comments per Minute')
-        plt.xlabel('Stream Time (HH:MM)')
-        plt.ylabel('Number of Comments')
-        plt.tight_layout()
-        plt.savefig(os.path.join(output_dir, f"{video_id}_comments_per_minute.png"))
-        plt.close()
+        ax.set_title('Comments per Minute')
+        ax.set_xlabel('Stream Time (HH:MM)')
+        ax.set_ylabel('Number of Comments')
+        fig.tight_layout()
+        fig.savefig(os.path.join(output_dir, f"{video_id}_comments_per_minute.png"))
+        ax.clear()
 
     # 2. Comments by 5-minute interval
-    if 'five_minute_interval' in df.columns:
-        plt.figure(figsize=(12, 6))
-        
-        # Group by 5-minute interval and count comments - NOT accumulating
-        five_min_intervals = df.groupby('five_minute_interval').size()
-        
-        # Sort by interval for chronological order
-        five_min_intervals = five_min_intervals.sort_index()
-        
+    if 'minute_mark' in df.columns:
         # Convert interval to readable time format for x-axis
         interval_labels = [f"{m//60:02d}:{m%60:02d}" for m in five_min_intervals.index]
         
         # Plot the data
-        plt.bar(range(len(five_min_intervals)), five_min_intervals.values, color='coral')
+        ax.bar(range(len(five_min_intervals)), five_min_intervals.values, color='coral', rasterized=True)
         
         # Set x-axis ticks and labels (showing fewer labels to avoid crowding)
         tick_spacing = max(1, len(five_min_intervals) // 15)  # Show ~15 labels at most
-        plt.xticks(
-            range(0, len(five_min_intervals), tick_spacing),
+        ax.set_xticks(range(0, len(five_min_intervals), tick_spacing))
+        ax.set_xticklabels(
             [interval_labels[i] for i in range(0, len(five_min_intervals), tick_spacing)],
             rotation=45
         )
         
-        plt.title('Comments by 5-Minute Intervals')
-        plt.xlabel('Stream Time (HH:MM)')
-        plt.ylabel('Number of Comments')
-        plt.tight_layout()
-        plt.savefig(os.path.join(output_dir, f"{video_id}_five_minute_intervals.png"))
-        plt.close()
+        ax.set_title('Comments by 5-Minute Intervals')
+        ax.set_xlabel('Stream Time (HH:MM)')
+        ax.set_ylabel('Number of Comments')
+        fig.tight_layout()
+        fig.savefig(os.path.join(output_dir, f"{video_id}_five_minute_intervals.png"))
+    
+    plt.close(fig)
     
     print(f"Visualizations saved to {output_dir}")
 
@@ -261,24 +285,23 @@ def print_analysis_summary(analysis, file_name):
 def save_analysis_results(analysis, file_name, output_dir):
     """Save analysis results to CSV files."""
     analysis_dir = os.path.join(output_dir, "analysis")
-    if not os.path.exists(analysis_dir):
-        os.makedirs(analysis_dir)
+    os.makedirs(analysis_dir, exist_ok=True)
     
     # Base name for output files
     base_name = os.path.splitext(os.path.basename(file_name))[0]
     
     # Save top commenters
-    analysis['top_commenters'].to_csv(os.path.join(analysis_dir, f"{base_name}_top_commenters.csv"), index=False)
+    write_csv(analysis['top_commenters'], os.path.join(analysis_dir, f"{base_name}_top_commenters.csv"))
     
     # Save interval data if available
     if not analysis['five_minute_intervals'].empty:
-        analysis['five_minute_intervals'].to_csv(os.path.join(analysis_dir, f"{base_name}_five_minute_intervals.csv"), index=False)
+        write_csv(analysis['five_minute_intervals'], os.path.join(analysis_dir, f"{base_name}_five_minute_intervals.csv"))
     
     if not analysis['ten_minute_intervals'].empty:
-        analysis['ten_minute_intervals'].to_csv(os.path.join(analysis_dir, f"{base_name}_ten_minute_intervals.csv"), index=False)
+        write_csv(analysis['ten_minute_intervals'], os.path.join(analysis_dir, f"{base_name}_ten_minute_intervals.csv"))
     
     # Save top comments
-    analysis['top_comments'].to_csv(os.path.join(analysis_dir, f"{base_name}_top_comments.csv"), index=False)
+    write_csv(analysis['top_comments'], os.path.join(analysis_dir, f"{base_name}_top_comments.csv"))
     
     # Save overall summary
     summary = {
@@ -327,7 +350,7 @@ def main():
         
         # Generate visualizations
         if not args.no_visualizations:
-            generate_visualizations(df, args.json_file, args.output_dir)
+            generate_visualizations(df, args.json_file, args.output_dir, analysis["activity_counts"])
     
     print("\nDone! Live chat data has been analyzed.")
 
@@ -3,12 +3,15 @@
 YouTube Chat Downloader for Videos in Text File
 
 This script reads a tab-separated text file containing YouTube video information
-and runs live_chat.py to download the live chat replay for specific videos.
+and uses live_chat.py to download the live chat replay for specific videos.
+live_chat.py is imported and called directly, with one connection pool shared
+by every download.
 The output is saved in JSON format with the filename: <videoId>_live_chat.json
 
 The script checks if files already exist in both the current directory and a 'json'
 subdirectory before downloading, allowing for resuming interrupted processes
-without duplicating work.
+without duplicating work. Each finished video is also recorded in .chat_done.txt,
+so videos finished on an earlier run are skipped without checking for files.
 
 Usage:
     python3 chat_from_txt.py TEXTFILE [OPTIONS]
@@ -20,17 +23,78 @@ Options:
     --position POSITION     Position of a specific video to process
     --start POSITION        Starting position to begin processing videos from
     --force                 Force redownload even if the file already exists
-    --timeout SECONDS       Set timeout in seconds for download operations (default: 300)
+    --timeout SECONDS       Time limit in seconds for each video's download (default: 300)
+    --workers N             Number of videos to download at the same time (default: 4)
+    --rate N                Maximum downloads started per second (default: 1)
 """
 
 import sys
 import os
-import subprocess
-import re
+import csv
 import shutil
 import argparse
 import time
 import signal
+import threading
+from bisect import bisect_left
+from typing import NamedTuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import live_chat
+
+# Connection pool shared across videos and worker threads. main() creates it,
+# so --help works even without requests installed.
+session = None
+
+# Directory chat files are saved in, and the two names a video's chat file may
+# have: the standard one and the one live_chat.py used to write
+_JSON_DIR = "json"
+_JSON_PREFIX = _JSON_DIR + os.sep
+_CHAT_SUFFIX = "_live_chat.json"
+_REPLAY_SUFFIX = "_live_chat_replay.json"
+
+# Append-only list of the IDs of videos whose chat data has been saved
+_MANIFEST = ".chat_done.txt"
+_manifest_lock = threading.Lock()
+
+class RateLimiter:
+    """Token bucket that lets downloads start at most `rate` times per second.
+    
+    Up to `burst` downloads may start at once after an idle period. delay()
+    takes a token and returns how long to wait before using it; wait() sleeps
+    for that long.
+    """
+    
+    def __init__(self, rate=1.0, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def delay(self):
+        """Take a token and return the seconds to wait until it is available."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            
+            # A negative balance reserves tokens for callers already waiting
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+    
+    def wait(self):
+        """Block until a token is available."""
+        time.sleep(self.delay())
+
+# Spaces out the downloads; main() replaces it using --rate and --workers
+rate_limiter = RateLimiter()
+
+class Video(NamedTuple):
+    """A video listed in the text file."""
+    position: int
+    videoId: str
+    title: str
 
 # Global variable to track if we're being interrupted
 interrupted = False
@@ -45,49 +109,45 @@ def signal_handler(sig, frame):
 signal.signal(signal.SIGINT, signal_handler)
 
 def read_text_file(text_path):
-    """Read video information from a tab-separated text file."""
+    """Read video information from a tab-separated text file.
+    
+    The file is parsed a row at a time with csv.DictReader. Each line is
+    stripped and blank ones, whitespace-only included, are skipped before
+    parsing. Quotes have no special meaning, as titles may contain them.
+    """
     videos = []
     try:
-        with open(text_path, 'r', encoding='utf-8') as file:
-            # Read all lines
-            lines = file.readlines()
-            
-            # Skip empty lines
-            lines = [line for line in lines if line.strip()]
+        with open(text_path, 'r', encoding='utf-8', newline='') as file:
+            lines = filter(None, map(str.strip, file))
+            reader = csv.DictReader(lines, delimiter='\t', quoting=csv.QUOTE_NONE)
             
-            if not lines:
+            if not reader.fieldnames:
                 print(f"Error: Text file is empty: {text_path}")
                 sys.exit(1)
             
-            # Extract headers from the first line
-            headers = lines[0].strip().split('\t')
-            
             # Ensure required headers exist
-            if 'Position' not in headers or 'Video ID' not in headers or 'Title' not in headers:
+            if not {'Position', 'Video ID', 'Title'}.issubset(reader.fieldnames):
                 print(f"Error: Text file must contain columns: Position, Video ID, Title")
                 sys.exit(1)
             
-            # Map headers to column indices
-            headers_map = {header: idx for idx, header in enumerate(headers)}
-            position_idx = headers_map.get('Position')
-            video_id_idx = headers_map.get('Video ID')
-            title_idx = headers_map.get('Title')
-            
             # Process data rows
-            for line in lines[1:]:  # Skip header row
-                columns = line.strip().split('\t')
+            for row in reader:
+                position, video_id, title = row['Position'], row['Video ID'], row['Title']
                 
                 # Skip rows with insufficient columns
-                if len(columns) <= max(position_idx, video_id_idx, title_idx):
-                    print(f"Warning: Skipping row with insufficient columns: {line.strip()}")
+                if None in (position, video_id, title):
+                    line = '\t'.join(value for value in row.values() if isinstance(value, str))
+                    print(f"Warning: Skipping row with insufficient columns: {line}")
                     continue
                 
-                video = {
-                    "position": columns[position_idx],
-                    "videoId": columns[video_id_idx],
-                    "title": columns[title_idx]
-                }
-                videos.append(video)
+                # Parse the position once so later comparisons are plain integers
+                try:
+                    position = int(position)
+                except ValueError:
+                    print(f"Warning: Skipping row with non-integer position: {position}")
+                    continue
+                
+                videos.append(Video(position, video_id, title))
         
         return videos
     except FileNotFoundError:
@@ -97,136 +157,164 @@ def read_text_file(text_path):
         print(f"Error reading text file: {e}")
         sys.exit(1)
 
-def run_live_chat_script(video_id, timeout=300, force=False):
-    """Run the live_chat.py script to download chat data for a specific video."""
-    # Define expected output filenames
-    expected_output = f"{video_id}_live_chat.json"
-    live_chat_output = f"{video_id}_live_chat_replay.json"
+def index_by_position(videos):
+    """Return a dictionary from position to the first video there in the file."""
+    by_position = {}
+    for video in videos:
+        by_position.setdefault(video.position, video)
+    return by_position
+
+def videos_from_position(videos, start_position):
+    """Return the videos at start_position or later, in file order.
     
-    possible_locations = [
-        expected_output,                           # Standard output name
-        live_chat_output,                          # Output name from live_chat.py
-        os.path.join("json", expected_output),     # json subdirectory with standard name
-        os.path.join("json", live_chat_output)     # json subdirectory with live_chat.py name
-    ]
+    The first of them by position is found with a binary search over the
+    sorted positions, rather than comparing every video.
+    """
+    order = sorted(range(len(videos)), key=lambda index: videos[index].position)
+    positions = [videos[index].position for index in order]
+    first = bisect_left(positions, start_position)
+    return [videos[index] for index in sorted(order[first:])]
+
+def read_manifest():
+    """Return the IDs of the videos recorded as done in the manifest."""
+    try:
+        with open(_MANIFEST, 'r', encoding='utf-8') as file:
+            return set(file.read().split())
+    except FileNotFoundError:
+        return set()
+
+def record_done(video_id):
+    """Append a video ID to the manifest; safe to call from worker threads."""
+    with _manifest_lock:
+        with open(_MANIFEST, 'a', encoding='utf-8') as file:
+            file.write(video_id + "\n")
+
+def list_existing_files():
+    """List the files in the current directory and the json subdirectory.
     
-    # Check if the JSON file already exists in any location (unless force is True)
-    if not force:
-        for file_path in possible_locations:
-            if os.path.exists(file_path):
-                print(f"Chat data already exists at {file_path}.")
-                
-                # If it's already in the expected format, just return it
-                if file_path == expected_output or file_path == os.path.join("json", expected_output):
-                    return file_path
-                
-                # Otherwise, we'll need to rename it to the expected format
-                target_path = expected_output if os.path.dirname(file_path) == "" else os.path.join("json", expected_output)
-                print(f"Renaming {file_path} to {target_path} for consistency...")
-                shutil.copy2(file_path, target_path)
-                return target_path
+    Paths are relative, e.g. "x.json" and "json/x.json", so they can be
+    compared directly against the locations a chat file may be saved at.
+    """
+    existing_files = set()
+    for directory, prefix in ((".", ""), (_JSON_DIR, _JSON_PREFIX)):
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_file():
+                        existing_files.add(prefix + entry.name)
+        except FileNotFoundError:
+            continue
+    return existing_files
+
+def download_live_chat(video_id, timeout=300):
+    """Download chat data for a video by calling live_chat.py in this process."""
+    print(f"Downloading chat data for {video_id} with live_chat.download_chat")
+    try:
+        return live_chat.download_chat(video_id, _JSON_DIR, timeout=timeout, session=session)
+    except live_chat.ChatNotFoundError:
+        print(f"No live chat data available for this video (video might not have had a live chat)")
+    except live_chat.LiveChatError as e:
+        print(f"Error running live_chat.py: {e}")
+    return None
+
+def _link_or_copy(src, dst):
+    """Make dst another name for src, copying only if a hard link isn't possible.
     
+    Both names are kept, as with a copy, but a hard link shares the data
+    instead of rewriting the whole file.
+    """
     try:
-        # Create json directory if it doesn't exist
-        if not os.path.exists("json"):
-            os.makedirs("json")
-        
-        # Handle video IDs that start with a hyphen by using -- to mark end of options
-        if video_id.startswith('-'):
-            cmd = ["python3", "live_chat.py", "--", video_id, "-o", "json"]
-        else:
-            cmd = ["python3", "live_chat.py", video_id, "-o", "json"]
-            
-        print(f"Running: {' '.join(cmd)}")
-        
-        # Execute the command with timeout
-        try:
-            result = subprocess.run(cmd, check=True, capture_output=True, text=True, timeout=timeout)
-            
-            # The live_chat.py script outputs to <videoId>_live_chat_replay.json
-            src_file = os.path.join("json", live_chat_output)
-            dst_file = os.path.join("json", expected_output)
-            
-            # Check if the output file was created
-            if os.path.exists(src_file):
-                # Rename to our expected format for consistency
-                print(f"Renaming {src_file} to {dst_file} for consistency...")
-                shutil.copy2(src_file, dst_file)
-                return dst_file
-            
-            # Check if output was created with the expected_output name directly
-            if os.path.exists(os.path.join("json", expected_output)):
-                return os.path.join("json", expected_output)
-                    
-            print(f"Warning: Expected output file not found after running live_chat.py")
-            return None
-        except subprocess.TimeoutExpired:
-            print(f"Error: Command timed out after {timeout} seconds")
-            return None
-            
-    except subprocess.CalledProcessError as e:
-        # Check for common error patterns
-        if "Error: Could not find live chat replay data in the video" in e.stdout:
-            print(f"No live chat data available for this video (video might not have had a live chat)")
-        else:
-            print(f"Error running live_chat.py: {e}")
-            print(f"Script output: {e.stdout}")
-            print(f"Script error: {e.stderr}")
-        return None
+        os.link(src, dst)
+    except OSError:
+        # Links fail across filesystems, on some filesystems, or if dst exists
+        shutil.copy2(src, dst)
+
+def _paths(video_id):
+    """Return the four locations chat data for a video may be saved at.
+    
+    In order: the standard name and the live_chat.py name in the current
+    directory, then the same two names in the json subdirectory.
+    """
+    standard = video_id + _CHAT_SUFFIX
+    replay = video_id + _REPLAY_SUFFIX
+    return (standard, replay, _JSON_PREFIX + standard, _JSON_PREFIX + replay)
+
+def _locate_chat_file(video_id, existing_files):
+    """Return the first location where chat data for a video exists, or None."""
+    for file_path in _paths(video_id):
+        if file_path in existing_files:
+            return file_path
+    return None
+
+def run_live_chat_script(video_id, timeout=300):
+    """Run live_chat.py to download chat data for a specific video.
+    
+    Existing files are not checked here; process_video has already done that.
+    The json directory is expected to exist; main() creates it.
+    """
+    try:
+        # Only actual downloads are rate limited, not videos that are skipped
+        rate_limiter.wait()
+        return download_live_chat(video_id, timeout)
     except Exception as e:
         print(f"Error: {e}")
         return None
 
-def process_video(video, timeout=300, force=False):
-    """Process a single video: download chat data."""
-    video_id = video["videoId"]
-    title = video["title"]
-    position = video["position"]
+def _start_video(video, force=False, existing_files=None, done_ids=frozenset()):
+    """Announce a video and check whether its chat data is already saved.
     
-    print(f"\nProcessing video {position}: {title} (ID: {video_id})")
+    Returns True if nothing needs to be downloaded.
+    """
+    video_id = video.videoId
     
-    # Expected JSON filename
-    json_filename = f"{video_id}_live_chat.json"
-    live_chat_filename = f"{video_id}_live_chat_replay.json"
+    print(f"\nProcessing video {video.position}: {video.title} (ID: {video_id})")
     
-    possible_locations = [
-        json_filename,                           # Standard output name
-        live_chat_filename,                      # Output name from live_chat.py
-        os.path.join("json", json_filename),     # json subdirectory with standard name
-        os.path.join("json", live_chat_filename) # json subdirectory with live_chat.py name
-    ]
+    # Skip videos the manifest says are done without touching the file system
+    if not force and video_id in done_ids:
+        print(f"Chat data already downloaded (recorded in {_MANIFEST}).")
+        return True
     
     # Check if output file already exists in any location
-    file_exists = False
     if not force:
-        for file_path in possible_locations:
-            if os.path.exists(file_path):
-                print(f"Chat data file already exists at {file_path}.")
-                
-                # If it's not in the expected format, rename it
-                expected_path = os.path.join("json", json_filename)
-                if file_path != expected_path:
-                    print(f"Copying to {expected_path} for consistency...")
-                    # Ensure json directory exists
-                    if not os.path.exists("json"):
-                        os.makedirs("json")
-                    shutil.copy2(file_path, expected_path)
-                
-                file_exists = True
-                break
-    
-    if file_exists and not force:
-        return True
+        if existing_files is None:
+            existing_files = list_existing_files()
+        file_path = _locate_chat_file(video_id, existing_files)
+        if file_path is not None:
+            print(f"Chat data file already exists at {file_path}.")
+            
+            # If it's not in the expected format, rename it
+            expected_path = _paths(video_id)[2]
+            if file_path != expected_path:
+                print(f"Copying to {expected_path} for consistency...")
+                _link_or_copy(file_path, expected_path)
+            
+            record_done(video_id)
+            return True
     
-    # Run the live_chat.py script
-    output_file = run_live_chat_script(video_id, timeout, force)
+    return False
+
+def _finish_video(video, output_file):
+    """Report the result of downloading a video's chat data."""
     if not output_file:
-        print(f"Failed to get chat data for video: {title}")
+        print(f"Failed to get chat data for video: {video.title}")
         return False
     
     print(f"Successfully downloaded chat data: {output_file}")
+    record_done(video.videoId)
     return True
 
+def process_video(video, timeout=300, force=False, existing_files=None, done_ids=frozenset()):
+    """Process a single video: download chat data.
+    
+    existing_files is the set from list_existing_files(); it is built here if
+    not given. done_ids holds the video IDs read from the manifest.
+    """
+    if _start_video(video, force, existing_files, done_ids):
+        return True
+    
+    # Run the live_chat.py script
+    return _finish_video(video, run_live_chat_script(video.videoId, timeout))
+
 def parse_args():
     """Parse command line arguments."""
     parser = argparse.ArgumentParser(description="Download YouTube chat data for videos in a text file")
@@ -234,14 +322,31 @@ def parse_args():
     parser.add_argument("--position", type=int, help="Position of a specific video to process")
     parser.add_argument("--start", type=int, help="Starting position to begin processing videos from")
     parser.add_argument("--force", action="store_true", help="Force redownload even if files exist")
-    parser.add_argument("--timeout", type=int, default=300, help="Timeout in seconds for download operations (default: 300)")
+    parser.add_argument("--timeout", type=int, default=300, help="Time limit in seconds for each video's download (default: 300)")
+    parser.add_argument("--workers", type=int, default=4, help="Number of videos to download at the same time (default: 4)")
+    parser.add_argument("--rate", type=float, default=1.0, help="Maximum downloads started per second (default: 1)")
     return parser.parse_args()
 
 def main():
     """Main function."""
+    global rate_limiter, session
+    
     # Parse command line arguments
     args = parse_args()
     
+    if args.rate <= 0:
+        print("Error: --rate must be greater than 0")
+        sys.exit(1)
+    
+    try:
+        session = live_chat.create_session(live_chat.USER_AGENTS["chrome"], pool_connections=16, pool_maxsize=32)
+    except ImportError:
+        print("Error: live_chat.py needs the requests package (pip install requests)")
+        sys.exit(1)
+    
+    # Let each worker start right away, then keep to the rate
+    rate_limiter = RateLimiter(args.rate, burst=max(1, args.workers))
+    
     text_path = args.text_file
     target_position = args.position
     start_position = args.start
@@ -257,23 +362,26 @@ def main():
     
     print(f"Found {len(videos)} videos in {text_path}")
     
+    # Create the json directory once, before any video needs it
+    os.makedirs(_JSON_DIR, exist_ok=True)
+    
+    # Read the videos finished on earlier runs from the manifest. Only if some
+    # aren't in it are the files already downloaded listed, once, rather than
+    # checking every possible location of every video on disk
+    done_ids = set() if force else read_manifest()
+    if force or all(video.videoId in done_ids for video in videos):
+        existing_files = set()
+    else:
+        existing_files = list_existing_files()
+    
     # Process specific video or all videos from a starting position
     if target_position is not None:
         # Find the video with the specified position
-        target_video = None
-        for video in videos:
-            # Convert position to integer for comparison
-            try:
-                video_position = int(video["position"])
-                if video_position == target_position:
-                    target_video = video
-                    break
-            except ValueError:
-                # Skip videos with non-integer positions
-                continue
+        by_position = index_by_position(videos)
+        target_video = by_position.get(target_position)
         
         if target_video:
-            process_video(target_video, timeout, force)
+            process_video(target_video, timeout, force, existing_files, done_ids)
         else:
             print(f"Error: No video found at position {target_position}")
     else:
@@ -281,33 +389,29 @@ def main():
         videos_to_process = videos
         
         if start_position is not None:
-            # Filter videos to only include those with position >= start_position
-            videos_to_process = []
-            for video in videos:
-                try:
-                    video_position = int(video["position"])
-                    if video_position >= start_position:
-                        videos_to_process.append(video)
-                except ValueError:
-                    # Skip videos with non-integer positions
-                    continue
+            # Only include videos with position >= start_position
+            videos_to_process = videos_from_position(videos, start_position)
             
             print(f"Starting from position {start_position}. {len(videos_to_process)} videos will be processed.")
         
-        successful_count = 0
-        for video in videos_to_process:
-            # Check if user interrupted the process
-            if interrupted:
-                print("Interrupted by user. Stopping processing.")
-                break
-                
-            success = process_video(video, timeout, force)
-            if success:
-                successful_count += 1
+        # Downloads are network-bound, so several videos run at once on threads
+        with ThreadPoolExecutor(max_workers=max(1, args.workers)) as executor:
+            futures = []
+            for video in videos_to_process:
+                # Check if user interrupted the process
+                if interrupted:
+                    break
+                futures.append(executor.submit(process_video, video, timeout, force, existing_files, done_ids))
             
-            # Add a small delay between requests to avoid overloading
-            if not interrupted:
-                time.sleep(1)
+            for future in as_completed(futures):
+                # Drop the downloads not yet started; leaving the with block
+                # still waits for the running ones to finish
+                if interrupted:
+                    print("Interrupted by user. Stopping processing.")
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    break
+        
+        successful_count = sum(1 for future in futures if not future.cancelled() and future.result())
         
         print(f"\nProcessed {successful_count} out of {len(videos_to_process)} videos successfully")
 
@@ -0,0 +1,108 @@
+"""
+Chat Data Helpers
+-----------------
+Helpers shared by chat.py and chat_analysis.py for loading downloaded chat
+messages into columns, turning their stream offsets into seconds, counting
+messages per interval and writing the results to CSV.
+"""
+
+import numpy as np
+import pandas as pd
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:
+    pa = None
+
+# Stream offsets look like "2:30", "1:02:30" or "-0:45" (before the stream starts)
+_TIME_OFFSET_PATTERN = r"^(-)?(?:(\d+):)?(\d+):(\d+)$"
+
+def parse_time_offsets(offsets):
+    """Convert a Series of stream offsets to integer seconds (0 if unparseable)."""
+    parts = offsets.astype(str).str.extract(_TIME_OFFSET_PATTERN)
+    parsed = parts[1].astype(float).fillna(0) * 3600 + parts[2].astype(float) * 60 + parts[3].astype(float)
+    parsed = parsed * np.where(parts[0].notna(), -1, 1)
+    
+    # Offsets that are already plain numbers are used as they are
+    return pd.to_numeric(offsets, errors="coerce").fillna(parsed).fillna(0).astype(np.int64)
+
+def read_chat_columns(path):
+    """Stream a JSON array of chat messages into a dictionary of column lists.
+    
+    Requires ijson. Records are parsed one at a time, so the whole list of
+    message dictionaries is never held in memory. Fields a record lacks are None.
+    Raises ValueError if the file doesn't hold an array.
+    """
+    columns = {}
+    count = 0
+    with open(path, "rb") as f:
+        # ijson.items finds no items in anything but an array, which would
+        # look like a chat with no messages
+        _, first_event, _ = next(ijson.parse(f), (None, None, None))
+        if first_event != "start_array":
+            raise ValueError(f"Expected a JSON array of chat messages in {path}")
+        f.seek(0)
+        
+        for record in ijson.items(f, "item", use_float=True):
+            for key, value in record.items():
+                column = columns.get(key)
+                if column is None:
+                    column = columns[key] = [None] * count
+                column.append(value)
+            count += 1
+            for column in columns.values():
+                if len(column) < count:
+                    column.append(None)
+    return columns
+
+def count_activity(minute_marks):
+    """Count messages per minute, 5-minute and 10-minute interval.
+    
+    All three come from one np.bincount over the minute marks; the coarser
+    intervals are sums over the reshaped finer-grained counts. Each Series is
+    indexed by the starting minute and only holds intervals with messages.
+    """
+    minutes = np.asarray(minute_marks, dtype=np.int64)
+    
+    # Offsets can be negative (chat before the stream starts), so count from a
+    # 10-minute aligned origin to keep the 5 and 10-minute bins on the same
+    # boundaries as floor division
+    origin = minutes.min() // 10 * 10
+    per_minute = np.bincount(minutes - origin)
+    per_minute = np.pad(per_minute, (0, -len(per_minute) % 10))
+    
+    # Each 10-minute bin is a pair of 5-minute bins
+    per_five = per_minute.reshape(-1, 5).sum(axis=1)
+    per_ten = per_five.reshape(-1, 2).sum(axis=1)
+    
+    activity = []
+    for counts, width in ((per_minute, 1), (per_five, 5), (per_ten, 10)):
+        series = pd.Series(counts, index=origin + width * np.arange(len(counts)))
+        activity.append(series[series > 0])
+    return tuple(activity)
+
+def write_csv(df, path):
+    """Write a DataFrame to CSV with pyarrow's C++ writer when it is installed.
+    
+    pyarrow quotes the header and every string field, so the header comes from
+    pandas and the rows are written unquoted, matching to_csv byte for byte.
+    Tables with a field that does need quoting are written by pandas.
+    """
+    if pa is not None:
+        try:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            with open(path, "wb") as f:
+                f.write(df.head(0).to_csv(index=False).encode())
+                pa_csv.write_csv(table, f, pa_csv.WriteOptions(include_header=False, quoting_style="none"))
+            return
+        except pa.ArrowException:
+            # Commas, quotes or line breaks in a field, or columns pyarrow
+            # can't type (e.g. mixed objects), go through pandas
+            pass
+    df.to_csv(path, index=False)
@@ -8,15 +8,32 @@ Handles both JSON and XML responses from YouTube.
 """
 
 import argparse
+from importlib.util import find_spec
 import json
 import os
 import re
-import requests
 import sys
 import time
 from urllib.parse import parse_qs, urlparse
 import xml.etree.ElementTree as ET
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# requests, httpx and asyncio are imported in the functions that use them, so
+# --help and importing this module for its helpers stay fast. httpx is only
+# needed to download several videos concurrently; it speaks HTTP/2 when h2 is
+# installed too.
+_HAS_HTTPX = find_spec("httpx") is not None
+_HAS_H2 = find_spec("h2") is not None
+
+# urllib3 and httpx decode brotli responses themselves, but only when brotli or
+# brotlicffi is installed
+_HAS_BROTLI = find_spec("brotli") is not None or find_spec("brotlicffi") is not None
+_ACCEPT_ENCODING = "gzip, deflate, br" if _HAS_BROTLI else "gzip, deflate"
+
 USER_AGENTS = {
     "chrome": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/123.0.0.0 Safari/537.36",
     "firefox": "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:124.0) Gecko/20100101 Firefox/124.0",
@@ -24,51 +41,329 @@ USER_AGENTS = {
     "safari": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.0 Safari/605.1.15"
 }
 
-def get_video_info(video_id, user_agent):
-    """Get video metadata from YouTube."""
-    url = f"https://www.youtube.com/watch?v={video_id}"
+# Where the JSON objects embedded in the watch page are assigned, and which
+# object each anchor is for. All four are found with one regex, in a single
+# pass over the page.
+_ANCHORS = {
+    'var ytInitialData': "data",
+    'window["ytInitialData"]': "data",
+    'var ytInitialPlayerResponse': "player",
+    'window["ytInitialPlayerResponse"]': "player",
+}
+_RE_ANCHOR = re.compile(b"|".join(re.escape(anchor.encode()) for anchor in _ANCHORS))
+_MAX_ANCHOR_LENGTH = max(len(anchor) for anchor in _ANCHORS)
+
+# The "= {" after an anchor, and the tokens that matter when finding the end
+# of a JSON object: braces, and whole string literals, which are skipped in one
+# step so braces inside them aren't counted
+_RE_ASSIGN = re.compile(r'\s*=\s*(?=\{)')
+_RE_JSON_TOKEN = re.compile(r'[{}]|"[^"\\]*(?:\\.[^"\\]*)*"', re.DOTALL)
+
+# Most connections opened at once when downloading several videos
+_MAX_CONNECTIONS = 10
+
+# The watch page is read in chunks of this many bytes, and only searched until
+# both embedded objects have been found. The chat replay is read in chunks too,
+# so the time limit can be checked between them.
+_PAGE_CHUNK_SIZE = 65536
+
+def _loads(text):
+    """Parse JSON text, using orjson when it is installed.
+    
+    orjson's decode error subclasses json.JSONDecodeError, so callers can
+    catch that in either case.
+    """
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
+def _dumps(data, pretty=False):
+    """Serialize data as UTF-8 JSON bytes, using orjson when it is installed.
+    
+    The output is compact unless pretty is set, which indents it by two spaces.
+    """
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 if pretty else 0)
+    if pretty:
+        return json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8")
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def _slice_json_after(haystack, anchor):
+    """Return the JSON object assigned right after anchor, or None.
+    
+    Braces are counted in a single pass, so the object ends at its real
+    closing brace even if a string inside it contains "};".
+    """
+    index = haystack.find(anchor)
+    if index < 0:
+        return None
+    
+    assign = _RE_ASSIGN.match(haystack, index + len(anchor))
+    if not assign:
+        return None
+    
+    start = assign.end()
+    depth = 0
+    for token in _RE_JSON_TOKEN.finditer(haystack, start):
+        text = token.group()
+        if text == "{":
+            depth += 1
+        elif text == "}":
+            depth -= 1
+            if depth == 0:
+                return haystack[start:token.end()]
+    return None
+
+def _iter_dicts(obj):
+    """Yield every dictionary nested in obj, depth first in document order."""
+    stack = [obj]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, dict):
+            yield item
+            stack.extend(reversed(list(item.values())))
+        elif isinstance(item, list):
+            stack.extend(reversed(item))
+
+def _find_key(obj, key):
+    """Return the first string value stored under key anywhere in obj, or None."""
+    for item in _iter_dicts(obj):
+        value = item.get(key)
+        if isinstance(value, str):
+            return value
+    return None
+
+def _contains_key(obj, key):
+    """Check whether key appears in any dictionary nested in obj."""
+    return any(key in item for item in _iter_dicts(obj))
+
+class _PageScanner:
+    """Finds ytInitialData and the player response in a watch page read in chunks.
     
-    headers = {
+    Each chunk is searched for anchors only once, and an object is sliced out
+    as soon as the end of its <script> element has been read.
+    """
+    
+    def __init__(self):
+        self.buffer = bytearray()
+        self.found = {"data": None, "player": None}
+        # Where the next anchor search starts
+        self._pos = 0
+    
+    def done(self):
+        """Check whether both objects have been found."""
+        return self.found["data"] is not None and self.found["player"] is not None
+    
+    def feed(self, chunk):
+        """Add the next chunk of the page; return True once both objects are found."""
+        self.buffer += chunk
+        self._scan(complete=False)
+        return self.done()
+    
+    def result(self):
+        """Return the JSON text of both objects, each None if it isn't in the page.
+        
+        Once the whole page has been read, an object still missing may be one
+        whose script element runs to the end of the page.
+        """
+        if not self.done():
+            self._scan(complete=True)
+        return self.found["data"], self.found["player"]
+    
+    def _scan(self, complete):
+        """Slice out the object at each anchor after the last one scanned.
+        
+        Unless complete, the scan stops at an anchor whose <script> element
+        hasn't been fully read yet, and resumes there on the next chunk.
+        """
+        while not self.done():
+            match = _RE_ANCHOR.search(self.buffer, self._pos)
+            if match is None:
+                if not complete:
+                    # Keep enough of the tail to find an anchor split across chunks
+                    self._pos = max(self._pos, len(self.buffer) - _MAX_ANCHOR_LENGTH + 1)
+                return
+            
+            anchor = match.group().decode()
+            name = _ANCHORS[anchor]
+            if self.found[name] is None:
+                end = self.buffer.find(b"</script>", match.end())
+                if end < 0:
+                    if not complete:
+                        # Wait for the rest of the script element
+                        self._pos = match.start()
+                        return
+                    end = len(self.buffer)
+                script = bytes(self.buffer[match.start():end]).decode("utf-8", errors="replace")
+                self.found[name] = _slice_json_after(script, anchor)
+            self._pos = match.end()
+
+def _read_embedded_json(response, deadline=None):
+    """Read the watch page and return the JSON text of ytInitialData and the player response.
+    
+    Each is None if it isn't in the page. Chunks are only searched until both
+    have been found. The rest of the page is still read, without being kept,
+    because a response closed before its end can't go back to the pool and the
+    next request would need a new connection and TLS handshake. Raises
+    LiveChatError if deadline (a time.monotonic() value) passes first.
+    """
+    scanner = _PageScanner()
+    for chunk in response.iter_content(chunk_size=_PAGE_CHUNK_SIZE):
+        if not scanner.done():
+            scanner.feed(chunk)
+        _time_left(deadline)
+    return scanner.result()
+
+def _read_text(response, deadline=None):
+    """Read a streamed response body as text, raising LiveChatError if deadline passes first."""
+    body = bytearray()
+    for chunk in response.iter_content(chunk_size=_PAGE_CHUNK_SIZE):
+        body += chunk
+        _time_left(deadline)
+    return _decode_body(body, response)
+
+async def _read_embedded_json_async(response):
+    """Like _read_embedded_json, for a streamed httpx response."""
+    scanner = _PageScanner()
+    async for chunk in response.aiter_bytes(_PAGE_CHUNK_SIZE):
+        if not scanner.done():
+            scanner.feed(chunk)
+    return scanner.result()
+
+async def _read_text_async(response):
+    """Like _read_text, for a streamed httpx response."""
+    body = bytearray()
+    async for chunk in response.aiter_bytes(_PAGE_CHUNK_SIZE):
+        body += chunk
+    return _decode_body(body, response)
+
+def _decode_body(body, response):
+    """Decode a response body read in chunks, with the charset the response declares."""
+    return body.decode(response.encoding or "utf-8", errors="replace")
+
+def create_session(user_agent, pool_connections=4, pool_maxsize=8):
+    """Create a requests.Session with the default headers for YouTube requests.
+    
+    All requests made through the session share its keep-alive connection
+    pool, so the watch page and chat requests reuse one TLS connection.
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+    
+    session = requests.Session()
+    # A plain adapter: requests already builds its SSL context once at import
+    # and urllib3 already sets TCP_NODELAY, so a custom one would add nothing
+    session.mount("https://", HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize))
+    session.headers.update({
         "User-Agent": user_agent,
         "Accept-Language": "en-US,en;q=0.9",
-    }
+        "Accept-Encoding": _ACCEPT_ENCODING,
+    })
+    return session
+
+def create_async_client(user_agent, max_connections=_MAX_CONNECTIONS):
+    """Create an httpx.AsyncClient with the default headers for YouTube requests.
     
-    response = requests.get(url, headers=headers)
+    Requires httpx. Concurrent downloads share its pool of at most
+    max_connections connections, multiplexed over HTTP/2 when h2 is installed.
+    """
+    import httpx
+    
+    limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+    return httpx.AsyncClient(
+        headers={
+            "User-Agent": user_agent,
+            "Accept-Language": "en-US,en;q=0.9",
+            "Accept-Encoding": _ACCEPT_ENCODING,
+        },
+        limits=limits,
+        http2=_HAS_H2,
+        # requests follows redirects (e.g. to consent or locale pages) by
+        # default and httpx doesn't, so match it
+        follow_redirects=True,
+    )
+
+class LiveChatError(Exception):
+    """Raised when the live chat replay can't be downloaded."""
+
+class ChatNotFoundError(LiveChatError):
+    """Raised when a video has no live chat replay."""
+
+def _deadline(timeout):
+    """Return the time.monotonic() value timeout seconds from now, or None for no limit."""
+    return None if timeout is None else time.monotonic() + timeout
+
+def _time_left(deadline):
+    """Return the seconds left before deadline (None if there is none), or raise LiveChatError.
+    
+    requests applies its timeout to each connect and read rather than to the
+    whole request, so the time left is passed as the timeout of each request and
+    checked again between the chunks read. A download can still overrun the
+    limit by the time one chunk takes to arrive.
+    """
+    if deadline is None:
+        return None
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise LiveChatError("Timed out before the download finished")
+    return remaining
+
+def _watch_url(video_id):
+    """Return the URL of a video's watch page."""
+    return f"https://www.youtube.com/watch?v={video_id}"
+
+def _check_status(response, message):
+    """Raise LiveChatError with message unless a requests or httpx response is 200 OK."""
     if response.status_code != 200:
-        print(f"Error: Could not fetch video page. Status code: {response.status_code}")
-        sys.exit(1)
+        raise LiveChatError(f"{message}. Status code: {response.status_code}")
+
+def get_video_info(video_id, user_agent, timeout=None, session=None):
+    """Get video metadata from YouTube.
     
-    html_content = response.text
+    The request goes through session, whose headers are used; without one, a
+    session is created for user_agent. timeout limits the whole request, in
+    seconds.
+    """
+    if session is None:
+        with create_session(user_agent) as session:
+            return get_video_info(video_id, user_agent, timeout, session)
     
-    # Try to extract ytInitialData
-    data_match = re.search(r'var ytInitialData\s*=\s*(\{.+?\});', html_content)
-    if not data_match:
-        data_match = re.search(r'window\["ytInitialData"\]\s*=\s*(\{.+?\});', html_content)
+    deadline = _deadline(timeout)
     
-    if not data_match:
-        print("Error: Could not find ytInitialData in the video page.")
-        sys.exit(1)
+    # Stream the page so it is only searched until the embedded data is found
+    with session.get(_watch_url(video_id), timeout=_time_left(deadline), stream=True) as response:
+        _check_status(response, "Could not fetch video page")
+        data_json, player_json = _read_embedded_json(response, deadline)
+    
+    return _parse_video_info(data_json, player_json)
+
+async def get_video_info_async(video_id, client, timeout=None):
+    """Get video metadata from YouTube through an httpx.AsyncClient."""
+    async with client.stream("GET", _watch_url(video_id), timeout=timeout) as response:
+        _check_status(response, "Could not fetch video page")
+        data_json, player_json = await _read_embedded_json_async(response)
+    
+    return _parse_video_info(data_json, player_json)
+
+def _parse_video_info(data_json, player_json):
+    """Parse the JSON text of ytInitialData and the player response."""
+    # Try to extract ytInitialData
+    if data_json is None:
+        raise LiveChatError("Could not find ytInitialData in the video page.")
     
     try:
-        yt_data = json.loads(data_match.group(1))
+        yt_data = _loads(data_json)
     except json.JSONDecodeError:
-        print("Error: Could not parse ytInitialData as JSON.")
-        sys.exit(1)
+        raise LiveChatError("Could not parse ytInitialData as JSON.")
     
     # Try to extract player response
-    player_match = re.search(r'var ytInitialPlayerResponse\s*=\s*(\{.+?\});', html_content)
-    if not player_match:
-        player_match = re.search(r'window\["ytInitialPlayerResponse"\]\s*=\s*(\{.+?\});', html_content)
-    
-    if not player_match:
-        print("Error: Could not find ytInitialPlayerResponse in the video page.")
-        sys.exit(1)
+    if player_json is None:
+        raise LiveChatError("Could not find ytInitialPlayerResponse in the video page.")
     
     try:
-        player_data = json.loads(player_match.group(1))
+        player_data = _loads(player_json)
     except json.JSONDecodeError:
-        print("Error: Could not parse ytInitialPlayerResponse as JSON.")
-        sys.exit(1)
+        raise LiveChatError("Could not parse ytInitialPlayerResponse as JSON.")
         
     return yt_data, player_data
 
@@ -84,7 +379,7 @@ def extract_chat_replay_url(player_data):
                         return track["baseUrl"]
         
         # Alternative method: Look for liveChatRenderer in ytInitialData
-        if "liveChatRenderer" in json.dumps(player_data):
+        if _contains_key(player_data, "liveChatRenderer"):
             # The presence indicates there's a live chat, but we need continuation tokens
             video_id = player_data.get("videoDetails", {}).get("videoId")
             if video_id:
@@ -97,11 +392,10 @@ def extract_chat_replay_url(player_data):
 def get_continuation_tokens(yt_data):
     """Extract continuation tokens for live chat replay."""
     try:
-        # Search for liveChatRenderer and extract continuation token
-        json_str = json.dumps(yt_data)
-        continuation_match = re.search(r'"continuation":"([^"]+)"', json_str)
-        if continuation_match:
-            return continuation_match.group(1)
+        # Search the data for the first continuation token
+        continuation = _find_key(yt_data, "continuation")
+        if continuation:
+            return continuation
         
         # Alternative locations for the continuation token
         contents = yt_data.get("contents", {}).get("twoColumnWatchNextResults", {}).get("conversationBar", {}).get("liveChatRenderer", {})
@@ -161,115 +455,236 @@ def xml_to_json(xml_content):
         # Return simplified format
         return {"xml_content": xml_content}
 
-def fetch_chat_replay(video_id, user_agent, output_dir="."):
-    """Fetch and save the live chat replay."""
-    print(f"Fetching live chat replay for video ID: {video_id}")
+def fetch_chat_replay(video_id, user_agent, output_dir=".", timeout=None, session=None, pretty=False):
+    """Fetch and save the live chat replay.
     
-    # Create output directory if it doesn't exist
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
+    Both requests go through session, or a new one for user_agent if none is
+    given. The JSON is written compact unless pretty is set. timeout limits
+    the whole download, both requests included, in seconds. Raises
+    ChatNotFoundError if the video has no live chat replay and LiveChatError
+    for any other failure, running out of time included.
+    """
+    if session is None:
+        with create_session(user_agent) as session:
+            return fetch_chat_replay(video_id, user_agent, output_dir, timeout, session, pretty)
+    
+    deadline = _deadline(timeout)
+    _start_fetch(video_id, output_dir)
     
     # Get video information
-    yt_data, player_data = get_video_info(video_id, user_agent)
+    yt_data, player_data = get_video_info(video_id, user_agent, _time_left(deadline), session)
+    chat_url, headers = _chat_request(video_id, yt_data, player_data)
     
-    # Extract chat replay URL
-    chat_url = extract_chat_replay_url(player_data)
-    if not chat_url:
-        # Try to get continuation token
-        continuation = get_continuation_tokens(yt_data)
-        if continuation:
-            chat_url = f"https://www.youtube.com/live_chat_replay/get_live_chat_replay?continuation={continuation}"
-        else:
-            print("Error: Could not find live chat replay data in the video.")
-            print("This video might not have a live chat replay available.")
-            sys.exit(1)
+    # Fetch the live chat data
+    with session.get(chat_url, headers=headers, timeout=_time_left(deadline), stream=True) as response:
+        _check_status(response, "Failed to download live chat replay")
+        content = _read_text(response, deadline)
     
-    print(f"Found live chat replay URL: {chat_url}")
+    # Process and save the data
+    return _save_chat_replay(content, video_id, output_dir, pretty)
+
+async def fetch_chat_replay_async(video_id, client, output_dir=".", timeout=None, pretty=False):
+    """Fetch and save the live chat replay through an httpx.AsyncClient.
     
-    # Create headers for chat request
-    headers = {
-        "User-Agent": user_agent,
-        "Accept-Language": "en-US,en;q=0.9",
-        "Referer": f"https://www.youtube.com/watch?v={video_id}"
-    }
+    Raises the same errors as fetch_chat_replay.
+    """
+    _start_fetch(video_id, output_dir)
     
-    # Fetch the live chat data
-    print("Downloading live chat replay data...")
-    response = requests.get(chat_url, headers=headers)
+    yt_data, player_data = await get_video_info_async(video_id, client, timeout)
+    chat_url, headers = _chat_request(video_id, yt_data, player_data)
     
-    if response.status_code != 200:
-        print(f"Error: Failed to download live chat replay. Status code: {response.status_code}")
-        sys.exit(1)
+    async with client.stream("GET", chat_url, headers=headers, timeout=timeout) as response:
+        _check_status(response, "Failed to download live chat replay")
+        content = await _read_text_async(response)
     
-    # Determine appropriate filename
-    output_file = os.path.join(output_dir, f"{video_id}_live_chat.json")
+    return _save_chat_replay(content, video_id, output_dir, pretty)
+
+def _start_fetch(video_id, output_dir):
+    """Announce the download of a video's chat replay and create output_dir if needed."""
+    print(f"Fetching live chat replay for video ID: {video_id}")
+    os.makedirs(output_dir, exist_ok=True)
+
+def _chat_request(video_id, yt_data, player_data):
+    """Return the URL and extra headers of the chat replay request, or raise ChatNotFoundError."""
+    chat_url = _chat_replay_url(yt_data, player_data)
+    print(f"Found live chat replay URL: {chat_url}")
+    print("Downloading live chat replay data...")
     
-    # Process and save the data
-    content = response.text
+    # The session or client already sends the common headers
+    return chat_url, {"Referer": _watch_url(video_id)}
+
+def _chat_replay_url(yt_data, player_data):
+    """Return the URL of the live chat replay, or raise ChatNotFoundError."""
+    chat_url = extract_chat_replay_url(player_data)
+    if chat_url:
+        return chat_url
     
+    # Try to get continuation token
+    continuation = get_continuation_tokens(yt_data)
+    if continuation:
+        return f"https://www.youtube.com/live_chat_replay/get_live_chat_replay?continuation={continuation}"
+    raise ChatNotFoundError("Could not find live chat replay data in the video.")
+
+def _save_chat_replay(content, video_id, output_dir=".", pretty=False):
+    """Save the chat replay response as JSON in output_dir and return the file path."""
+    output_file = os.path.join(output_dir, f"{video_id}_live_chat.json")
     try:
-        with open(output_file, "w", encoding="utf-8") as f:
-            # First check if it's XML
-            if is_xml(content):
-                print("Detected XML response, converting to JSON format...")
-                json_data = xml_to_json(content)
-                json.dump(json_data, f, ensure_ascii=False, indent=2)
-            else:
-                # Try to parse as JSON
-                try:
-                    chat_data = json.loads(content)
-                    json.dump(chat_data, f, ensure_ascii=False, indent=2)
-                except json.JSONDecodeError:
-                    # If not valid JSON, create a simple JSON wrapper
-                    print("Warning: Response is not valid JSON or XML, wrapping in a JSON object...")
-                    json.dump({"raw_content": content}, f, ensure_ascii=False, indent=2)
+        # First check if it's XML
+        if is_xml(content):
+            print("Detected XML response, converting to JSON format...")
+            chat_data = xml_to_json(content)
+        else:
+            # Try to parse as JSON
+            try:
+                chat_data = _loads(content)
+            except json.JSONDecodeError:
+                # If not valid JSON, create a simple JSON wrapper
+                print("Warning: Response is not valid JSON or XML, wrapping in a JSON object...")
+                chat_data = {"raw_content": content}
+        
+        with open(output_file, "wb") as f:
+            f.write(_dumps(chat_data, pretty))
         
         print(f"Successfully saved live chat replay to: {output_file}")
         return output_file
     except Exception as e:
-        print(f"Error saving chat replay: {e}")
-        sys.exit(1)
+        raise LiveChatError(f"Could not save chat replay: {e}")
+
+def download_chat(video_id, output_dir=".", browser="chrome", timeout=None, session=None, pretty=False):
+    """Download the live chat replay of a video and return the saved file path.
+    
+    This is the entry point for other scripts that run the download in their
+    own process; passing the same session from create_session() for every
+    video reuses its connections, and its headers are used instead of browser.
+    timeout limits the whole download in seconds, like a timeout on running
+    live_chat.py. Network failures are raised as LiveChatError too.
+    """
+    import requests
+    
+    user_agent = USER_AGENTS.get(browser, USER_AGENTS["chrome"])
+    try:
+        return fetch_chat_replay(video_id, user_agent, output_dir, timeout, session, pretty)
+    except requests.RequestException as e:
+        raise LiveChatError(f"Request failed: {e}")
+
+async def download_chat_async(video_id, client, output_dir=".", timeout=None, pretty=False):
+    """Download the live chat replay of a video through an httpx.AsyncClient.
+    
+    timeout limits the whole download and network failures are raised as
+    LiveChatError, as in download_chat.
+    """
+    import asyncio
+    import httpx
+    
+    try:
+        return await asyncio.wait_for(fetch_chat_replay_async(video_id, client, output_dir, timeout, pretty), timeout)
+    except asyncio.TimeoutError:
+        raise LiveChatError("Timed out before the download finished")
+    except httpx.HTTPError as e:
+        raise LiveChatError(f"Request failed: {e}")
+
+async def fetch_many(video_ids, output_dir=".", browser="chrome", timeout=None, pretty=False):
+    """Download the live chat replays of several videos concurrently.
+    
+    Requires httpx. Returns, in the order of video_ids, the saved file path
+    or the exception raised for each video.
+    """
+    import asyncio
+    
+    user_agent = USER_AGENTS.get(browser, USER_AGENTS["chrome"])
+    max_connections = max(1, min(len(video_ids), _MAX_CONNECTIONS))
+    async with create_async_client(user_agent, max_connections) as client:
+        return await asyncio.gather(
+            *(download_chat_async(video_id, client, output_dir, timeout, pretty) for video_id in video_ids),
+            return_exceptions=True,
+        )
+
+def _video_id_from_arg(value):
+    """Return the video ID in a video ID or URL argument, or None."""
+    # Check if input is a full URL and extract video ID if needed
+    if "youtube.com" in value or "youtu.be" in value:
+        parsed_url = urlparse(value)
+        if parsed_url.netloc == "youtu.be":
+            return parsed_url.path.lstrip("/") or None
+        query_params = parse_qs(parsed_url.query)
+        return query_params.get("v", [""])[0] or None
+    return value
 
 def parse_args():
     """Parse command line arguments."""
-    parser = argparse.ArgumentParser(description="Download YouTube live chat replays")
-    parser.add_argument("video_id", help="YouTube video ID or URL")
+    parser = argparse.ArgumentParser(
+        description="Download YouTube live chat replays",
+        epilog="A single video is downloaded with requests. Several videos are "
+               "downloaded concurrently with httpx when it is installed, and one "
+               "after another with requests otherwise.")
+    parser.add_argument("video_ids", nargs="+", metavar="video_id", help="YouTube video IDs or URLs")
     parser.add_argument("-b", "--browser", choices=["chrome", "firefox", "edge", "safari"], 
                         default="chrome", help="Browser to emulate (default: chrome)")
     parser.add_argument("-o", "--output-dir", default=".", 
                         help="Output directory for the chat replay file (default: current directory)")
+    parser.add_argument("--pretty", action="store_true",
+                        help="Indent the saved JSON (default: compact)")
     
     args = parser.parse_args()
     
-    # Check if input is a full URL and extract video ID if needed
-    if "youtube.com" in args.video_id or "youtu.be" in args.video_id:
-        parsed_url = urlparse(args.video_id)
-        if parsed_url.netloc == "youtu.be":
-            video_id = parsed_url.path.lstrip("/")
-        else:
-            query_params = parse_qs(parsed_url.query)
-            video_id = query_params.get("v", [""])[0]
-        
+    video_ids = []
+    for value in args.video_ids:
+        video_id = _video_id_from_arg(value)
         if not video_id:
-            print("Error: Could not extract video ID from URL.")
+            print(f"Error: Could not extract video ID from URL: {value}")
             sys.exit(1)
-        
-        args.video_id = video_id
+        video_ids.append(video_id)
+    args.video_ids = video_ids
     
     return args
 
+def report_results(video_ids, results):
+    """Print the outcome of each download and return the exit status.
+    
+    Each failure is reported on an "Error: <message>" line; with several
+    videos it is preceded by the ID.
+    """
+    saved = []
+    for video_id, result in zip(video_ids, results):
+        if isinstance(result, Exception):
+            if len(video_ids) > 1:
+                print(f"Video {video_id}:", file=sys.stderr)
+            print(f"Error: {result}", file=sys.stderr)
+            if isinstance(result, ChatNotFoundError):
+                print("This video might not have a live chat replay available.", file=sys.stderr)
+        else:
+            saved.append(result)
+    
+    if saved:
+        print(f"\nDone! Downloaded {len(saved)} of {len(results)} live chat replays.")
+        for output_file in saved:
+            print(f"File saved to: {output_file}")
+    return 0 if len(saved) == len(results) else 1
+
+async def main_async(args):
+    """Download the live chat replays of every video concurrently."""
+    results = await fetch_many(args.video_ids, args.output_dir, args.browser, pretty=args.pretty)
+    return report_results(args.video_ids, results)
+
 def main():
     """Main function."""
     args = parse_args()
     
-    # Get user agent for the selected browser
-    user_agent = USER_AGENTS.get(args.browser)
-    
-    # Fetch and save the live chat replay
-    output_file = fetch_chat_replay(args.video_id, user_agent, args.output_dir)
+    # httpx only pays off when there are several videos to download at once;
+    # a single video, or several without httpx, go one after another through
+    # one requests session's connections
+    if len(args.video_ids) > 1 and _HAS_HTTPX:
+        import asyncio
+        sys.exit(asyncio.run(main_async(args)))
     
-    print("\nDone! Live chat replay has been downloaded.")
-    print(f"File saved to: {output_file}")
+    results = []
+    with create_session(USER_AGENTS.get(args.browser)) as session:
+        for video_id in args.video_ids:
+            try:
+                results.append(download_chat(video_id, args.output_dir, args.browser, session=session, pretty=args.pretty))
+            except LiveChatError as e:
+                results.append(e)
+    sys.exit(report_results(args.video_ids, results))
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -21,15 +21,37 @@ import sys
 import re
 import json
 import argparse
-import datetime
-import subprocess
+from functools import lru_cache
 from urllib.parse import urlparse, parse_qs
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def _loads(line):
+    """Parse a line of JSON (str or bytes), using orjson when it is installed.
+    
+    orjson's decode error subclasses json.JSONDecodeError, so callers can
+    catch that in either case.
+    """
+    if orjson is not None:
+        return orjson.loads(line)
+    return json.loads(line)
+
+# The first list parameter of a youtube.com or youtu.be URL, for the common
+# case of an ID made of URL-safe characters; anything else goes through urlparse
+_RE_PLAYLIST_URL = re.compile(r'https?://[^/?#]*(?:youtube\.com|youtu\.be)[^?#]*\?(?:(?!list=)[^#&]*&)*list=([A-Za-z0-9_-]+)(?=$|[&#])')
+
 def extract_playlist_id(url_or_id):
     """Extract playlist ID from a URL or return the ID if already provided."""
     if not url_or_id.startswith('http'):
         return url_or_id
     
+    match = _RE_PLAYLIST_URL.match(url_or_id)
+    if match:
+        return match.group(1)
+    
     parsed_url = urlparse(url_or_id)
     
     # Handle youtube.com URLs
@@ -47,6 +69,11 @@ def extract_playlist_id(url_or_id):
     print(f"Error: Could not extract playlist ID from URL: {url_or_id}")
     sys.exit(1)
 
+# Formatted values are cached, since playlist rows often repeat them (same
+# day, missing counts, common durations)
+_FORMAT_CACHE_SIZE = 8192
+
+@lru_cache(maxsize=_FORMAT_CACHE_SIZE)
 def format_view_count(view_count):
     """Format view count with commas."""
     try:
@@ -54,6 +81,7 @@ def format_view_count(view_count):
     except (ValueError, TypeError):
         return view_count or "N/A"
 
+@lru_cache(maxsize=_FORMAT_CACHE_SIZE)
 def format_duration(duration_seconds):
     """Format duration in seconds to MM:SS or HH:MM:SS."""
     if not duration_seconds:
@@ -71,19 +99,82 @@ def format_duration(duration_seconds):
     except (ValueError, TypeError):
         return str(duration_seconds)
 
+@lru_cache(maxsize=_FORMAT_CACHE_SIZE)
 def format_date(timestamp):
     """Format Unix timestamp to YYYY-MM-DD."""
     if not timestamp:
         return "N/A"
     
+    import datetime
+    
     try:
         dt = datetime.datetime.fromtimestamp(int(timestamp))
         return dt.strftime("%Y-%m-%d")
     except (ValueError, TypeError):
         return str(timestamp)
 
+# Header and video key of each column in the output file
+_OUTPUT_COLUMNS = (
+    ("Position", "position"),
+    ("Video ID", "videoId"),
+    ("Title", "title"),
+    ("Published Date", "publishedAt"),
+    ("Channel", "channelTitle"),
+    ("Views", "viewCount"),
+    ("Comments", "commentCount"),
+    ("Duration", "duration"),
+    ("Channel ID", "channel_id"),
+)
+
+def new_video_columns():
+    """Return empty parallel lists, one per output column, keyed by video key.
+    
+    Videos are stored by column rather than as one dictionary each.
+    """
+    return {key: [] for _, key in _OUTPUT_COLUMNS}
+
+def count_videos(videos):
+    """Return the number of videos held in the column lists."""
+    return len(videos["position"])
+
+def _append_video(videos, position, video_data):
+    """Append one video's formatted yt-dlp metadata to the column lists."""
+    videos["position"].append(position)
+    videos["videoId"].append(video_data.get("id", "N/A"))
+    videos["title"].append(video_data.get("title", "N/A"))
+    videos["publishedAt"].append(format_date(video_data.get("timestamp")))
+    videos["channelTitle"].append(video_data.get("channel", "N/A"))
+    videos["viewCount"].append(format_view_count(video_data.get("view_count")))
+    videos["commentCount"].append(format_view_count(video_data.get("comment_count")))
+    videos["duration"].append(format_duration(video_data.get("duration")))
+    videos["channel_id"].append(video_data.get("channel_id", "N/A"))
+
+def _rows_from_jsonl(stream):
+    """Yield (position, video_data) for each line of yt-dlp JSON output.
+    
+    Lines may be str or bytes. A line that isn't valid JSON is reported and
+    skipped, but still takes up its position.
+    """
+    for i, line in enumerate(stream):
+        if not line.strip():
+            continue
+        
+        try:
+            video_data = _loads(line)
+        except json.JSONDecodeError:
+            print(f"Warning: Could not parse JSON for video at position {i + 1}")
+            continue
+        
+        yield i + 1, video_data
+        
+        # Print progress
+        if (i + 1) % 10 == 0:
+            print(f"Processed {i + 1} videos...")
+
 def check_yt_dlp_installed():
     """Check if yt-dlp is installed."""
+    import subprocess
+    
     try:
         subprocess.run(["yt-dlp", "--version"], check=True, capture_output=True)
         return True
@@ -91,8 +182,12 @@ def check_yt_dlp_installed():
         return False
 
 def get_playlist_videos_with_ytdlp(playlist_id):
-    """Get playlist videos using yt-dlp."""
-    videos = []
+    """Get playlist videos using yt-dlp, as column lists from new_video_columns()."""
+    # Imported here, so --help doesn't pay for them
+    import subprocess
+    import tempfile
+    
+    videos = new_video_columns()
     
     playlist_url = f"https://www.youtube.com/playlist?list={playlist_id}"
     print(f"Fetching playlist data for: {playlist_url}")
@@ -108,35 +203,19 @@ def get_playlist_videos_with_ytdlp(playlist_id):
     ]
     
     try:
-        # Run yt-dlp and capture output
-        process = subprocess.run(cmd, check=True, capture_output=True, text=True)
-        
-        # Process each line of output
-        for i, line in enumerate(process.stdout.splitlines()):
-            if not line.strip():
-                continue
+        # Run yt-dlp and parse each line of output as it arrives, rather than
+        # after the whole playlist has been fetched. stderr goes to a temporary
+        # file so a long error log can't fill its pipe and stall yt-dlp.
+        with tempfile.TemporaryFile() as stderr_file:
+            # Lines are read as bytes, which both JSON parsers accept directly
+            with subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=stderr_file) as process:
+                for position, video_data in _rows_from_jsonl(process.stdout):
+                    _append_video(videos, position, video_data)
             
-            try:
-                video_data = json.loads(line)
-                
-                videos.append({
-                    "position": i + 1,
-                    "videoId": video_data.get("id", "N/A"),
-                    "title": video_data.get("title", "N/A"),
-                    "publishedAt": format_date(video_data.get("timestamp")),
-                    "channelTitle": video_data.get("channel", "N/A"),
-                    "viewCount": format_view_count(video_data.get("view_count")),
-                    "commentCount": format_view_count(video_data.get("comment_count")),
-                    "duration": format_duration(video_data.get("duration")),
-                    "channel_id": video_data.get("channel_id", "N/A")
-                })
-                
-                # Print progress
-                if (i + 1) % 10 == 0:
-                    print(f"Processed {i + 1} videos...")
-            
-            except json.JSONDecodeError:
-                print(f"Warning: Could not parse JSON for video at position {i + 1}")
+            if process.returncode != 0:
+                stderr_file.seek(0)
+                stderr = stderr_file.read().decode("utf-8", errors="replace")
+                raise subprocess.CalledProcessError(process.returncode, cmd, stderr=stderr)
     
     except subprocess.CalledProcessError as e:
         print(f"Error running yt-dlp: {e}")
@@ -147,12 +226,14 @@ def get_playlist_videos_with_ytdlp(playlist_id):
             print("Trying to fetch with additional details...")
             return get_playlist_videos_with_ytdlp_detailed(playlist_id)
     
-    print(f"Total videos found: {len(videos)}")
+    print(f"Total videos found: {count_videos(videos)}")
     return videos
 
 def get_playlist_videos_with_ytdlp_detailed(playlist_id):
-    """Get more detailed playlist videos using yt-dlp."""
-    videos = []
+    """Get more detailed playlist videos using yt-dlp, as column lists from new_video_columns()."""
+    import subprocess
+    
+    videos = new_video_columns()
     
     playlist_url = f"https://www.youtube.com/playlist?list={playlist_id}"
     print(f"Fetching detailed playlist data for: {playlist_url}")
@@ -164,89 +245,43 @@ def get_playlist_videos_with_ytdlp_detailed(playlist_id):
         "--no-warnings",         # Reduce output noise
         "--dump-json",           # Output video info as JSON
         "--playlist-items", "1-1000",  # Limit to first 1000 items for safety
-        "--write-info-json",     # Write video info to JSON files
-        "--no-write-playlist-metafiles",  # Don't write playlist metadata files
         playlist_url
     ]
     
     try:
-        # Create a temporary directory for JSON files
-        temp_dir = "temp_ytdlp_json"
-        if not os.path.exists(temp_dir):
-            os.makedirs(temp_dir)
-        
-        # Set current directory to temp directory
-        original_dir = os.getcwd()
-        os.chdir(temp_dir)
-        
-        # Run yt-dlp and capture output
-        process = subprocess.run(cmd, check=True, capture_output=True, text=True)
+        # Run yt-dlp and capture its output as bytes; only the JSON on
+        # stdout is used, so nothing is written to disk
+        process = subprocess.run(cmd, check=True, capture_output=True)
         
         # Process each line of output
-        for i, line in enumerate(process.stdout.splitlines()):
-            if not line.strip():
-                continue
-            
-            try:
-                video_data = json.loads(line)
-                
-                videos.append({
-                    "position": i + 1,
-                    "videoId": video_data.get("id", "N/A"),
-                    "title": video_data.get("title", "N/A"),
-                    "publishedAt": format_date(video_data.get("timestamp")),
-                    "channelTitle": video_data.get("channel", "N/A"),
-                    "viewCount": format_view_count(video_data.get("view_count")),
-                    "commentCount": format_view_count(video_data.get("comment_count")),
-                    "duration": format_duration(video_data.get("duration")),
-                    "channel_id": video_data.get("channel_id", "N/A")
-                })
-                
-                # Print progress
-                if (i + 1) % 10 == 0:
-                    print(f"Processed {i + 1} videos...")
-            
-            except json.JSONDecodeError:
-                print(f"Warning: Could not parse JSON for video at position {i + 1}")
-        
-        # Return to original directory
-        os.chdir(original_dir)
+        for position, video_data in _rows_from_jsonl(process.stdout.splitlines()):
+            _append_video(videos, position, video_data)
         
     except subprocess.CalledProcessError as e:
         print(f"Error running yt-dlp in detailed mode: {e}")
-        print(f"Error output: {e.stderr}")
-        
-        # Return to original directory in case of error
-        if os.getcwd() != original_dir:
-            os.chdir(original_dir)
+        print(f"Error output: {e.stderr.decode('utf-8', errors='replace')}")
     
-    print(f"Total videos found with detailed mode: {len(videos)}")
+    print(f"Total videos found with detailed mode: {count_videos(videos)}")
     return videos
 
 def save_videos_to_file(videos, output_file):
-    """Save video details to a tab-separated text file."""
-    print(f"Saving {len(videos)} videos to {output_file}")
+    """Save video details, given as column lists, to a tab-separated text file."""
+    print(f"Saving {count_videos(videos)} videos to {output_file}")
     
     # Create directory if it doesn't exist
     output_dir = os.path.dirname(output_file)
-    if output_dir and not os.path.exists(output_dir):
-        os.makedirs(output_dir)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    
+    # Rows are assembled from the columns only as they are written
+    rows = zip(*(videos[key] for _, key in _OUTPUT_COLUMNS))
     
-    with open(output_file, "w", encoding="utf-8") as f:
+    with open(output_file, "w", encoding="utf-8", buffering=1 << 20) as f:
         # Write header
-        f.write("Position\tVideo ID\tTitle\tPublished Date\tChannel\tViews\tComments\tDuration\tChannel ID\n")
+        f.write("\t".join(header for header, _ in _OUTPUT_COLUMNS) + "\n")
         
-        # Write video details
-        for video in videos:
-            f.write(f"{video['position']}\t")
-            f.write(f"{video['videoId']}\t")
-            f.write(f"{video['title']}\t")
-            f.write(f"{video.get('publishedAt', 'N/A')}\t")
-            f.write(f"{video.get('channelTitle', 'N/A')}\t")
-            f.write(f"{video.get('viewCount', 'N/A')}\t")
-            f.write(f"{video.get('commentCount', 'N/A')}\t")
-            f.write(f"{video.get('duration', 'N/A')}\t")
-            f.write(f"{video.get('channel_id', 'N/A')}\n")
+        # Write video details, one joined line per video
+        f.writelines("\t".join(map(str, row)) + "\n" for row in rows)
     
     print(f"Videos successfully saved to {output_file}")
 
@@ -260,14 +295,15 @@ def parse_args():
 
 def main():
     """Main function."""
+    # Parse the arguments first, so --help works without running yt-dlp
+    args = parse_args()
+    
     # Check if yt-dlp is installed
     if not check_yt_dlp_installed():
         print("Error: yt-dlp is not installed or not found in PATH.")
         print("Please install it with: pip install yt-dlp")
         sys.exit(1)
     
-    args = parse_args()
-    
     # Extract playlist ID if a URL was provided
     playlist_id = extract_playlist_id(args.playlist_id)
     print(f"Using playlist ID: {playlist_id}")
@@ -276,9 +312,9 @@ def main():
     videos = get_playlist_videos_with_ytdlp(playlist_id)
     
     # Save videos to a file
-    if videos:
+    if count_videos(videos):
         save_videos_to_file(videos, args.output)
-        print(f"Extraction complete. Found {len(videos)} videos.")
+        print(f"Extraction complete. Found {count_videos(videos)} videos.")
     else:
         print("No videos were extracted from the playlist.")
 